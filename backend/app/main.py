@@ -2,6 +2,8 @@ from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from app.utils.database import Database
 from app.utils.redis_client import RedisClient
+from app.services.prediction_pool import PredictionPool
+from app.utils.serialization import ORJSONResponse
 
 # Import routers
 from app.routes import auth, betting_forms
@@ -10,7 +12,8 @@ from app.websocket import websocket_endpoint
 app = FastAPI(
     title="Soccer Betting Analyzer",
     description="Real-time soccer betting form analyzer with live match updates",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration for React frontend
@@ -27,6 +30,7 @@ async def startup_event():
     """Initialize database and Redis connections on startup"""
     await Database.connect_db()
     RedisClient.connect()
+    PredictionPool.start()
     print("🚀 Application started successfully")
 
 @app.on_event("shutdown")
@@ -34,6 +38,7 @@ async def shutdown_event():
     """Close database and Redis connections on shutdown"""
     await Database.close_db()
     RedisClient.disconnect()
+    PredictionPool.shutdown()
     print("👋 Application shutdown complete")
 
 # Include routers
@@ -1,13 +1,17 @@
+import asyncio
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, status
 from typing import List
 from datetime import datetime
 from bson import ObjectId
 
 from app.utils.auth import get_current_user
-from app.utils.database import get_collection
+from app.utils.database import Database
+from app.utils.cache import cached_find_fixture
+from app.utils.rate_limit import sports_api_semaphore
+from app.utils.serialization import ORJSONResponse
 from app.services.file_processor import BettingFormProcessor
 from app.services.sports_api import SportsAPIClient
-from app.services.prediction_engine import PredictionEngine
+from app.services.prediction_pool import PredictionPool
 from app.services.live_updater import start_monitoring
 
 router = APIRouter(prefix="/betting-forms", tags=["Betting Forms"])
@@ -28,24 +32,30 @@ async def upload_betting_form(
         )
     
     try:
-        # Read file content
-        content = await file.read()
+        # Starlette already spools uploads to disk past 1 MB, so hand the
+        # file object to the processor instead of reading it into memory
+        await file.seek(0)
         
         # Process the PDF
         processor = BettingFormProcessor()
-        processed_data = await processor.process_betting_form(content, file.filename)
+        processed_data = await processor.process_betting_form(file.file, file.filename)
         
         # Initialize API client
         api_client = SportsAPIClient()
         
-        # Enhance each game with API data and predictions
-        enhanced_games = []
-        for game in processed_data["games"]:
+        # Games matched to a fixture, with their prediction inputs
+        matched_games = []
+        prediction_inputs = []
+        
+        async def _enrich(game: dict) -> dict:
+            """Enhance a single game with API data"""
             # Find fixture in API
-            fixture = await api_client.find_fixture(
-                game["home_team"],
-                game["away_team"]
-            )
+            async with sports_api_semaphore:
+                fixture = await cached_find_fixture(
+                    api_client,
+                    game["home_team"],
+                    game["away_team"]
+                )
             
             if fixture:
                 game["game_id"] = fixture["fixture_id"]
@@ -58,41 +68,52 @@ async def upload_betting_form(
                 away_form = ["L", "D", "W", "L", "L"]  # Would come from API
                 h2h_results = []  # Would come from API
                 
-                # Calculate initial prediction
-                bet_type = game["bet_classification"]["specific"]
-                prediction = PredictionEngine.calculate_win_probability(
-                    home_form=home_form,
-                    away_form=away_form,
-                    h2h_results=h2h_results,
-                    home_team=game["home_team"],
-                    bet_type=bet_type
-                )
-                
-                # Calculate expected value
-                ev_analysis = PredictionEngine.calculate_expected_value(
-                    probability=prediction["win_probability"] / 100,
-                    odds=game["odds"],
-                    stake=game["stake"]
-                )
-                
-                game["initial_prediction"] = {
-                    **prediction,
-                    **ev_analysis
-                }
+                matched_games.append(game)
+                prediction_inputs.append({
+                    "prediction": {
+                        "home_form": home_form,
+                        "away_form": away_form,
+                        "h2h_results": h2h_results,
+                        "home_team": game["home_team"],
+                        "bet_type": game["bet_classification"]["specific"]
+                    },
+                    "odds": game["odds"],
+                    "stake": game["stake"]
+                })
             
-            enhanced_games.append(game)
-        
-        # Calculate overall analysis
-        total_stake = sum(game.get("stake", 0) for game in enhanced_games)
-        total_expected_return = sum(
-            game["stake"] * game["odds"] if game.get("initial_prediction", {}).get("win_probability", 0) > 50 else 0
-            for game in enhanced_games
-        )
+            return game
+        
+        # Enhance all games concurrently with API data
+        enhanced_games = list(await asyncio.gather(
+            *(_enrich(game) for game in processed_data["games"])
+        ))
+        
+        # Calculate initial predictions and expected values in one batch
+        predictions = await PredictionPool.predict(prediction_inputs)
+        for game, predicted in zip(matched_games, predictions):
+            if predicted is None:
+                continue
+            
+            prediction, ev_analysis = predicted
+            game["initial_prediction"] = {
+                **prediction,
+                **ev_analysis
+            }
+        
+        # Calculate overall analysis in a single pass
+        total_stake = 0
+        total_expected_return = 0
+        total_win_prob = 0
+        
+        for game in enhanced_games:
+            win_probability = game.get("initial_prediction", {}).get("win_probability")
+            total_stake += game.get("stake", 0)
+            total_win_prob += 50 if win_probability is None else win_probability
+            
+            if win_probability is not None and win_probability > 50:
+                total_expected_return += game["stake"] * game["odds"]
         
-        overall_win_prob = statistics.mean([
-            game.get("initial_prediction", {}).get("win_probability", 50)
-            for game in enhanced_games
-        ]) if enhanced_games else 50
+        overall_win_prob = total_win_prob / len(enhanced_games) if enhanced_games else 50
         
         overall_analysis = {
             "total_stake": total_stake,
@@ -105,7 +126,7 @@ async def upload_betting_form(
         }
         
         # Store in database
-        betting_forms_collection = get_collection("betting_forms")
+        betting_forms_collection = Database.betting_forms
         
         form_document = {
             "user_id": current_user["user_id"],
@@ -137,11 +158,20 @@ async def upload_betting_form(
 @router.get("/")
 async def get_user_betting_forms(current_user: dict = Depends(get_current_user)):
     """Get all betting forms for current user"""
-    betting_forms_collection = get_collection("betting_forms")
+    betting_forms_collection = Database.betting_forms
     
-    cursor = betting_forms_collection.find(
-        {"user_id": current_user["user_id"]}
-    ).sort("upload_date", -1)
+    # Only return summary fields, counting games on the server
+    cursor = betting_forms_collection.aggregate([
+        {"$match": {"user_id": current_user["user_id"]}},
+        {"$sort": {"upload_date": -1}},
+        {"$project": {
+            "upload_date": 1,
+            "status": 1,
+            "original_file_name": 1,
+            "overall_analysis": 1,
+            "total_games": {"$size": {"$ifNull": ["$games", []]}}
+        }}
+    ])
     
     forms = []
     async for document in cursor:
@@ -150,11 +180,12 @@ async def get_user_betting_forms(current_user: dict = Depends(get_current_user))
             "upload_date": document["upload_date"],
             "status": document["status"],
             "original_file_name": document["original_file_name"],
-            "total_games": len(document.get("games", [])),
+            "total_games": document["total_games"],
             "overall_analysis": document.get("overall_analysis", {})
         })
     
-    return {"forms": forms, "total": len(forms)}
+    # Encode directly with orjson, skipping FastAPI's jsonable_encoder pass
+    return ORJSONResponse({"forms": forms, "total": len(forms)})
 
 @router.get("/{form_id}")
 async def get_betting_form(
@@ -162,7 +193,7 @@ async def get_betting_form(
     current_user: dict = Depends(get_current_user)
 ):
     """Get detailed betting form by ID"""
-    betting_forms_collection = get_collection("betting_forms")
+    betting_forms_collection = Database.betting_forms
     
     try:
         document = await betting_forms_collection.find_one({
@@ -177,7 +208,9 @@ async def get_betting_form(
             )
         
         document["_id"] = str(document["_id"])
-        return document
+        
+        # Encode directly with orjson, skipping FastAPI's jsonable_encoder pass
+        return ORJSONResponse(document)
         
     except Exception as e:
         raise HTTPException(
@@ -191,7 +224,7 @@ async def delete_betting_form(
     current_user: dict = Depends(get_current_user)
 ):
     """Delete a betting form"""
-    betting_forms_collection = get_collection("betting_forms")
+    betting_forms_collection = Database.betting_forms
     
     try:
         result = await betting_forms_collection.delete_one({
@@ -211,6 +244,4 @@ async def delete_betting_form(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error deleting form: {str(e)}"
-        )
-
-import statistics  # Add this import at the top
\ No newline at end of file
+        )
\ No newline at end of file
@@ -1,12 +1,46 @@
 import asyncio
+from collections import defaultdict
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Set, Tuple
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
-from app.utils.database import get_collection
+from app.utils.database import Database
+from app.utils.rate_limit import sports_api_semaphore
+from app.utils.serialization import parse_datetime
 from app.services.sports_api import SportsAPIClient
-from app.services.prediction_engine import PredictionEngine
-from app.services.pusher_service import broadcast_update
+from app.services.prediction_pool import PredictionPool
+from app.services.pusher_service import broadcast_events
+
+# Coalesce updates for this long before broadcasting
+FLUSH_DELAY_SECONDS = 0.05
+
+# Broadcast immediately once this many updates are pending
+MAX_PENDING_UPDATES = 140
+
+# Football-Data.org statuses after which a game never changes again
+TERMINAL_STATUSES = {"FINISHED", "AWARDED", "CANCELLED"}
+
+# Recheck postponed games that have no new kickoff yet this often
+POSTPONED_RECHECK_SECONDS = 3600
+
+# Only the game fields the monitor reads each tick
+MONITOR_PROJECTION = {
+    "games.game_id": 1,
+    "games.home_team": 1,
+    "games.away_team": 1,
+    "games.kickoff_time": 1,
+    "games.bet_classification.specific": 1,
+    "games.odds": 1,
+    "games.stake": 1,
+    "games.initial_prediction.win_probability": 1,
+    "games.current_prediction.win_probability": 1,
+    "games.live_score": 1,
+    "games.minute": 1,
+    "games.status": 1,
+    "games.last_updated": 1
+}
 
 class LiveUpdater:
     """Background service to poll API and broadcast updates via Pusher"""
@@ -14,7 +48,16 @@ class LiveUpdater:
     def __init__(self):
         self.api_client = SportsAPIClient()
         self.active_forms = set()  # Track which forms are being monitored
-        self.tasks = {}  # Track running tasks
+        self.game_subscribers: Dict[str, Set[str]] = defaultdict(set)  # game_id -> {form_id}
+        self._oids: Dict[str, ObjectId] = {}  # form_id -> parsed ObjectId
+        self.task = None  # Shared polling task for all monitored forms
+        self._last_live: Dict[str, Optional[Dict[str, Any]]] = {}  # game_id -> live data from the last tick
+        self._new_forms: Set[str] = set()  # Forms subscribed since the last tick started
+        self._wake = asyncio.Event()  # Set when new forms need catching up
+        self._pending: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)  # form_id -> {game_id: update}
+        self._pending_count = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._broadcast_tasks: Set[asyncio.Task] = set()
     
     async def start_monitoring(self, form_id: str):
         """Start monitoring a betting form for live updates"""
@@ -22,148 +65,451 @@ class LiveUpdater:
             print(f"Already monitoring form {form_id}")
             return
         
+        if not ObjectId.is_valid(form_id):
+            print(f"Invalid form id {form_id}, not monitoring")
+            return
+        
+        betting_forms = Database.betting_forms
+        oid = ObjectId(form_id)
+        form = await betting_forms.find_one({"_id": oid}, {"games.game_id": 1})
+        
+        if not form:
+            print(f"Form {form_id} not found, not monitoring")
+            return
+        
+        # Subscribe the form to each of its games
         self.active_forms.add(form_id)
+        self._oids[form_id] = oid
+        for game in form.get("games", []):
+            if game.get("game_id"):
+                self.game_subscribers[game["game_id"]].add(form_id)
+        
         print(f"🎬 Started monitoring form {form_id}")
         
-        # Create background task
-        task = asyncio.create_task(self._monitor_form(form_id))
-        self.tasks[form_id] = task
+        # Start the shared background task if it isn't running, otherwise
+        # process just this form now instead of re-polling every game
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._monitor_games())
+        else:
+            self._new_forms.add(form_id)
+            self._wake.set()
     
     async def stop_monitoring(self, form_id: str):
         """Stop monitoring a betting form"""
         if form_id in self.active_forms:
-            self.active_forms.remove(form_id)
+            self._unsubscribe(form_id)
             
-            # Cancel task
-            if form_id in self.tasks:
-                self.tasks[form_id].cancel()
-                del self.tasks[form_id]
+            # Cancel the shared task once nothing is monitored
+            if not self.active_forms and self.task:
+                self.task.cancel()
+                self.task = None
             
             print(f"🛑 Stopped monitoring form {form_id}")
     
-    async def _monitor_form(self, form_id: str):
-        """Monitor a form and broadcast updates every 30 seconds"""
-        betting_forms = get_collection("betting_forms")
+    def _unsubscribe(self, form_id: str):
+        """Remove a form and its game subscriptions"""
+        self.active_forms.discard(form_id)
+        self._new_forms.discard(form_id)
+        self._oids.pop(form_id, None)
+        self._pending_count -= len(self._pending.pop(form_id, {}))
         
-        while form_id in self.active_forms:
-            try:
-                # Get form from database
-                form = await betting_forms.find_one({"_id": ObjectId(form_id)})
-                
-                if not form:
-                    print(f"Form {form_id} not found, stopping monitor")
-                    break
-                
-                # Check each game for updates
-                updates = []
+        for game_id in list(self.game_subscribers):
+            self.game_subscribers[game_id].discard(form_id)
+            if not self.game_subscribers[game_id]:
+                del self.game_subscribers[game_id]
+    
+    def _enqueue(self, form_id: str, update: Dict[str, Any]):
+        """Buffer a game update, replacing any pending update for the same game"""
+        pending = self._pending[form_id]
+        if update["game_id"] not in pending:
+            self._pending_count += 1
+        pending[update["game_id"]] = update
+        
+        if self._pending_count >= MAX_PENDING_UPDATES:
+            self._flush()
+        elif self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(FLUSH_DELAY_SECONDS, self._flush)
+    
+    def _flush(self):
+        """Broadcast all pending updates via Pusher in one batch"""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        pending, self._pending = self._pending, defaultdict(dict)
+        self._pending_count = 0
+        
+        events = []
+        for form_id, form_updates in pending.items():
+            updates = list(form_updates.values())
+            events.append({
+                "form_id": form_id,
+                "name": "live-update",
+                "data": {
+                    "type": "live_update",
+                    "updates": updates,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+            })
+        
+        if events:
+            task = asyncio.create_task(self._broadcast(events))
+            self._broadcast_tasks.add(task)
+            task.add_done_callback(self._broadcast_tasks.discard)
+    
+    @staticmethod
+    async def _broadcast(events: List[Dict[str, Any]]):
+        """Send a flushed batch and log each form once it has gone out"""
+        if await broadcast_events(events):
+            for event in events:
+                print(f"📡 Broadcasted {len(event['data']['updates'])} update(s) for form {event['form_id']}")
+    
+    @staticmethod
+    def _needs_polling(game: Dict[str, Any]) -> bool:
+        """Only games that have kicked off and not yet ended can change"""
+        if not game.get("game_id") or game.get("status") in TERMINAL_STATUSES:
+            return False
+        
+        now = datetime.utcnow()
+        kickoff = parse_datetime(game.get("kickoff_time"))
+        if kickoff and kickoff > now:
+            return False
+        
+        # A postponed game still past its old kickoff is only rechecked
+        # occasionally, until a new kickoff is known
+        if game.get("status") == "POSTPONED":
+            last_updated = parse_datetime(game.get("last_updated"))
+            return (
+                not last_updated
+                or (kickoff and last_updated < kickoff)
+                or (now - last_updated).total_seconds() >= POSTPONED_RECHECK_SECONDS
+            )
+        
+        return True
+    
+    async def _poll_game(self, game_id: str):
+        """Fetch live data for a single game, returning (game_id, live_data) or None"""
+        async with sports_api_semaphore:
+            live_data = await self.api_client.get_live_fixture_data(game_id)
+        
+        if not live_data:
+            return None
+        
+        return game_id, live_data
+    
+    @staticmethod
+    def _prediction_input(game: Dict[str, Any], live_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the prediction pool input for a live game"""
+        # Get form data (you'd cache this)
+        home_form = ["W", "W", "D", "W", "L"]
+        away_form = ["L", "D", "W", "L", "L"]
+        h2h_results = []
+        
+        return {
+            "prediction": {
+                "home_form": home_form,
+                "away_form": away_form,
+                "h2h_results": h2h_results,
+                "home_team": game["home_team"],
+                "bet_type": game.get("bet_classification", {}).get("specific", "home_win"),
+                "current_score": live_data.get("score", {}),
+                "minute": live_data.get("elapsed", 0)
+            },
+            "odds": game["odds"],
+            "stake": game["stake"]
+        }
+    
+    def _process_game(
+        self,
+        form_id: str,
+        game: Dict[str, Any],
+        live_data: Dict[str, Any],
+        updated_prediction: Dict[str, Any],
+        ev_analysis: Dict[str, Any],
+        now: datetime,
+        now_iso: str
+    ) -> Optional[Tuple[Dict[str, Any], UpdateOne]]:
+        """Build the broadcast update and database operation for one form's live game"""
+        game_id = game["game_id"]
+        status = live_data.get("status", "")
+        current_score = live_data.get("score", {})
+        minute = live_data.get("elapsed", 0)
+        
+        # Skip the write and broadcast when nothing has changed since the last tick
+        previous_probability = game.get("current_prediction", {}).get("win_probability")
+        if (
+            current_score == game.get("live_score")
+            and minute == game.get("minute")
+            and status == game.get("status")
+            and previous_probability is not None
+            and round(updated_prediction["win_probability"], 1) == round(previous_probability, 1)
+        ):
+            return None
+        
+        # Create update object
+        update = {
+            "game_id": game_id,
+            "home_team": game["home_team"],
+            "away_team": game["away_team"],
+            "current_score": {
+                "home": current_score.get("home", 0),
+                "away": current_score.get("away", 0)
+            },
+            "minute": minute,
+            "status": status,
+            "updated_prediction": {
+                **updated_prediction,
+                **ev_analysis
+            },
+            "initial_probability": game.get("initial_prediction", {}).get("win_probability", 50),
+            "change": round(
+                updated_prediction["win_probability"] -
+                game.get("initial_prediction", {}).get("win_probability", 50),
+                2
+            ),
+            "timestamp": now_iso
+        }
+        
+        # Database update
+        operation = UpdateOne(
+            {
+                "_id": self._oids[form_id],
+                "games.game_id": game_id
+            },
+            {
+                "$set": {
+                    "games.$.current_prediction": updated_prediction,
+                    "games.$.live_score": current_score,
+                    "games.$.minute": minute,
+                    "games.$.status": status,
+                    "games.$.last_updated": now
+                }
+            }
+        )
+        
+        return update, operation
+    
+    def _terminal_operation(
+        self,
+        form_id: str,
+        game_id: str,
+        live_data: Dict[str, Any],
+        now: datetime
+    ) -> UpdateOne:
+        """Record the final status and score so the game is no longer polled"""
+        return UpdateOne(
+            {
+                "_id": self._oids[form_id],
+                "games.game_id": game_id
+            },
+            {
+                "$set": {
+                    "games.$.status": live_data["status"],
+                    "games.$.live_score": live_data.get("score", {}),
+                    "games.$.last_updated": now
+                }
+            }
+        )
+    
+    def _postponed_operation(
+        self,
+        form_id: str,
+        game_id: str,
+        live_data: Dict[str, Any],
+        now: datetime
+    ) -> UpdateOne:
+        """Record a postponement and the rescheduled kickoff, if one is known"""
+        fields = {
+            "games.$.status": live_data["status"],
+            "games.$.last_updated": now
+        }
+        
+        kickoff = parse_datetime(live_data.get("kickoff"))
+        if kickoff:
+            fields["games.$.kickoff_time"] = kickoff
+        
+        return UpdateOne(
+            {
+                "_id": self._oids[form_id],
+                "games.game_id": game_id
+            },
+            {"$set": fields}
+        )
+    
+    async def _run_tick(
+        self,
+        queried: Dict[str, ObjectId],
+        known_live: Optional[Dict[str, Optional[Dict[str, Any]]]] = None
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Poll the games of the given forms and broadcast their updates
+        
+        Args:
+            queried: Forms to process, by form_id
+            known_live: Live data already fetched by game_id, reused instead of polling
+        
+        Returns:
+            Live data (or None) by game_id for every game that needed polling
+        """
+        betting_forms = Database.betting_forms
+        known_live = known_live or {}
+        
+        # Get the forms from database in one query
+        form_games: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        cursor = betting_forms.find(
+            {"_id": {"$in": list(queried.values())}},
+            MONITOR_PROJECTION
+        )
+        async for form in cursor:
+            form_games[str(form["_id"])] = {
+                game["game_id"]: game
+                for game in form.get("games", [])
+                if game.get("game_id")
+            }
+        
+        # Forms subscribed while the cursor was read are polled next tick
+        for form_id in queried.keys() - form_games.keys():
+            print(f"Form {form_id} not found, stopping monitor")
+            self._unsubscribe(form_id)
+        
+        # Poll each unique game once, skipping games that cannot have changed
+        game_ids = {
+            game_id
+            for games in form_games.values()
+            for game_id, game in games.items()
+            if self._needs_polling(game)
+        }
+        live_by_game = {game_id: known_live[game_id] for game_id in game_ids & known_live.keys()}
+        polled = [game_id for game_id in game_ids if game_id not in live_by_game]
+        
+        results = await asyncio.gather(
+            *(self._poll_game(game_id) for game_id in polled),
+            return_exceptions=True
+        )
+        
+        for game_id, result in zip(polled, results):
+            if isinstance(result, Exception):
+                print(f"Error fetching live data: {result}")
+                continue
+            
+            live_by_game[game_id] = result[1] if result else None
+        
+        # Dispatch each game's live data to every subscribed form
+        now = datetime.utcnow()
+        now_iso = now.isoformat()
+        db_operations = []
+        ready_updates = []
+        live_games = []
+        prediction_inputs = []
+        
+        for game_id, live_data in live_by_game.items():
+            if not live_data:
+                continue
+            
+            # Check if match is live
+            status = live_data.get("status", "")
+            
+            for form_id in self.game_subscribers.get(game_id, ()):
+                game = form_games.get(form_id, {}).get(game_id)
+                if not game:
+                    continue
                 
-                for game in form.get("games", []):
-                    game_id = game.get("game_id")
-                    
-                    if not game_id:
-                        continue
-                    
-                    # Fetch live data from API
-                    live_data = await self.api_client.get_live_fixture_data(game_id)
-                    
-                    if not live_data:
-                        continue
-                    
-                    # Check if match is live
-                    status = live_data.get("status", "")
-                    
-                    # Only process live matches
+                # A malformed game only skips itself, not the whole tick
+                try:
+                    # Only recalculate live matches
                     if status in ["IN_PLAY", "PAUSED"]:  # Football-Data.org statuses
-                        current_score = live_data.get("score", {})
-                        minute = live_data.get("elapsed", 0)
-                        
-                        # Recalculate prediction with live data
-                        bet_type = game.get("bet_classification", {}).get("specific", "home_win")
-                        
-                        # Get form data (you'd cache this)
-                        home_form = ["W", "W", "D", "W", "L"]
-                        away_form = ["L", "D", "W", "L", "L"]
-                        h2h_results = []
-                        
-                        updated_prediction = PredictionEngine.calculate_win_probability(
-                            home_form=home_form,
-                            away_form=away_form,
-                            h2h_results=h2h_results,
-                            home_team=game["home_team"],
-                            bet_type=bet_type,
-                            current_score=current_score,
-                            minute=minute
-                        )
-                        
-                        # Calculate EV
-                        ev_analysis = PredictionEngine.calculate_expected_value(
-                            probability=updated_prediction["win_probability"] / 100,
-                            odds=game["odds"],
-                            stake=game["stake"]
-                        )
-                        
-                        # Create update object
-                        update = {
-                            "game_id": game_id,
-                            "home_team": game["home_team"],
-                            "away_team": game["away_team"],
-                            "current_score": f"{current_score.get('home', 0)}-{current_score.get('away', 0)}",
-                            "minute": minute,
-                            "status": status,
-                            "updated_prediction": {
-                                **updated_prediction,
-                                **ev_analysis
-                            },
-                            "initial_probability": game.get("initial_prediction", {}).get("win_probability", 50),
-                            "change": round(
-                                updated_prediction["win_probability"] - 
-                                game.get("initial_prediction", {}).get("win_probability", 50),
-                                2
-                            ),
-                            "timestamp": datetime.utcnow().isoformat()
-                        }
-                        
-                        updates.append(update)
-                        
-                        # Update database
-                        await betting_forms.update_one(
-                            {
-                                "_id": ObjectId(form_id),
-                                "games.game_id": game_id
-                            },
-                            {
-                                "$set": {
-                                    "games.$.current_prediction": updated_prediction,
-                                    "games.$.live_score": current_score,
-                                    "games.$.minute": minute,
-                                    "games.$.status": status,
-                                    "games.$.last_updated": datetime.utcnow()
-                                }
-                            }
-                        )
-                
-                # Broadcast updates via Pusher if any
-                if updates:
-                    broadcast_update(form_id, {
-                        "type": "live_update",
-                        "updates": updates,
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
-                    print(f"📡 Broadcasted {len(updates)} update(s) for form {form_id}")
+                        prediction_inputs.append(self._prediction_input(game, live_data))
+                        live_games.append((form_id, game, live_data))
+                    elif status in TERMINAL_STATUSES:
+                        db_operations.append(self._terminal_operation(form_id, game_id, live_data, now))
+                    elif status == "POSTPONED":
+                        db_operations.append(self._postponed_operation(form_id, game_id, live_data, now))
+                except Exception as e:
+                    print(f"Error processing game {game_id} for form {form_id}: {e}")
+        
+        # Recalculate predictions for all live games in one batch
+        predictions = await PredictionPool.predict(prediction_inputs)
+        
+        for (form_id, game, live_data), predicted in zip(live_games, predictions):
+            # The form may have been unsubscribed while predictions ran
+            if form_id not in self.active_forms or predicted is None:
+                continue
+            
+            prediction, ev_analysis = predicted
+            
+            try:
+                processed = self._process_game(
+                    form_id, game, live_data, prediction, ev_analysis, now, now_iso
+                )
+            except Exception as e:
+                print(f"Error processing game {game['game_id']} for form {form_id}: {e}")
+                continue
+            
+            if processed:
+                update, operation = processed
+                ready_updates.append((form_id, update, len(db_operations)))
+                db_operations.append(operation)
+        
+        # Write all game updates in a single round-trip
+        failed_operations: Set[int] = set()
+        if db_operations:
+            try:
+                await betting_forms.bulk_write(db_operations, ordered=False)
+            except BulkWriteError as e:
+                failed_operations = {error["index"] for error in e.details.get("writeErrors", [])}
+                print(f"Error writing {len(failed_operations)} live update(s): {e}")
+            except Exception as e:
+                failed_operations = set(range(len(db_operations)))
+                print(f"Error writing live updates: {e}")
+        
+        # Only broadcast updates once they are stored, so clients
+        # refetching the form on an event see the new data
+        for form_id, update, index in ready_updates:
+            if index not in failed_operations and form_id in self.active_forms:
+                self._enqueue(form_id, update)
+        
+        return live_by_game
+    
+    async def _wait_for_next_tick(self):
+        """Sleep 30 seconds, processing newly monitored forms as they arrive"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 30
+        
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                return
+            self._wake.clear()
+            
+            # Only poll the new forms' games that the last tick didn't cover
+            new_forms = {form_id: self._oids[form_id] for form_id in self._new_forms}
+            self._new_forms.clear()
+            if new_forms:
+                try:
+                    self._last_live.update(await self._run_tick(new_forms, self._last_live))
+                except Exception as e:
+                    print(f"Error processing new forms: {e}")
+    
+    async def _monitor_games(self):
+        """Poll each unique game and broadcast updates to subscribed forms every 30 seconds"""
+        while self.active_forms:
+            try:
+                # Forms subscribed from here on are caught up separately
+                self._new_forms.clear()
+                self._wake.clear()
+                self._last_live = await self._run_tick(dict(self._oids))
                 
                 # Wait 30 seconds before next check
-                await asyncio.sleep(30)
-                
+                await self._wait_for_next_tick()
+            
             except asyncio.CancelledError:
-                print(f"Monitoring cancelled for form {form_id}")
+                print("Live monitoring cancelled")
                 break
             except Exception as e:
-                print(f"Error monitoring form {form_id}: {e}")
-                await asyncio.sleep(30)
-        
-        # Cleanup
-        if form_id in self.active_forms:
-            self.active_forms.remove(form_id)
+                print(f"Error monitoring forms: {e}")
+                await self._wait_for_next_tick()
 
 # Global instance
 live_updater = LiveUpdater()
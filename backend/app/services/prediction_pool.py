@@ -0,0 +1,91 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.services.prediction_engine import PredictionEngine
+
+def _batch_predict(inputs: List[Dict[str, Any]]) -> List[Optional[Tuple[Dict[str, Any], Dict[str, Any]]]]:
+    """Calculate win probability and expected value for a batch of games"""
+    results = []
+    
+    for item in inputs:
+        # A failing game yields None instead of failing the whole batch
+        try:
+            prediction = PredictionEngine.calculate_win_probability(**item["prediction"])
+            ev_analysis = PredictionEngine.calculate_expected_value(
+                probability=prediction["win_probability"] / 100,
+                odds=item["odds"],
+                stake=item["stake"]
+            )
+        except Exception as e:
+            print(f"Error calculating prediction: {e}")
+            results.append(None)
+            continue
+        
+        results.append((prediction, ev_analysis))
+    
+    return results
+
+class PredictionPool:
+    """Process pool that keeps prediction math off the event loop"""
+    executor: Optional[ProcessPoolExecutor] = None
+    
+    @classmethod
+    def _create_executor(cls) -> ProcessPoolExecutor:
+        # Spawn workers instead of forking a process that already runs
+        # Motor monitor and to_thread worker threads
+        return ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    
+    @classmethod
+    def start(cls):
+        cls.executor = cls._create_executor()
+        print("✅ Started prediction process pool")
+    
+    @classmethod
+    def shutdown(cls):
+        if cls.executor:
+            cls.executor.shutdown(wait=False, cancel_futures=True)
+            cls.executor = None
+            print("❌ Stopped prediction process pool")
+    
+    @classmethod
+    async def predict(cls, inputs: List[Dict[str, Any]]) -> List[Optional[Tuple[Dict[str, Any], Dict[str, Any]]]]:
+        """
+        Run a batch of predictions in the process pool
+        
+        Args:
+            inputs: One item per game with calculate_win_probability keyword
+                arguments under "prediction", plus "odds" and "stake"
+        
+        Returns:
+            (prediction, ev_analysis) tuples in the same order as inputs,
+            or None for games whose calculation failed
+        """
+        if not inputs:
+            return []
+        
+        # Falls back to the default thread pool if the process pool isn't running
+        loop = asyncio.get_running_loop()
+        executor = cls.executor
+        
+        try:
+            return await loop.run_in_executor(executor, _batch_predict, inputs)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM kill), replace the pool unless another
+            # caller already has
+            if executor is not None and cls.executor is executor:
+                print("❌ Prediction process pool broke, restarting it")
+                executor.shutdown(wait=False, cancel_futures=True)
+                cls.executor = cls._create_executor()
+        
+        try:
+            return await loop.run_in_executor(cls.executor, _batch_predict, inputs)
+        except BrokenProcessPool:
+            print("❌ Prediction process pool broke again, using thread pool")
+            return await loop.run_in_executor(None, _batch_predict, inputs)
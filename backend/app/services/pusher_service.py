@@ -1,10 +1,22 @@
+import asyncio
 import pusher
+import orjson
 import os
-from typing import Dict, Any
+from itertools import islice
+from typing import Dict, Any, List
 from dotenv import load_dotenv
 
+from app.utils.serialization import orjson_default
+
 load_dotenv()
 
+# Maximum number of events Pusher accepts in a single batch trigger
+PUSHER_BATCH_LIMIT = 10
+
+def serialize_payload(data: Dict[str, Any]) -> str:
+    """Encode event data to JSON once so Pusher sends it as-is"""
+    return orjson.dumps(data, default=orjson_default).decode()
+
 class PusherService:
     """Pusher service for real-time broadcasting"""
     
@@ -17,7 +29,7 @@ class PusherService:
             ssl=True
         )
     
-    def broadcast_live_update(self, form_id: str, data: Dict[str, Any]):
+    async def broadcast_live_update(self, form_id: str, data: Dict[str, Any]):
         """
         Broadcast live match update to all clients watching this form
         
@@ -26,37 +38,68 @@ class PusherService:
             data: Update data (game updates, scores, predictions)
         """
         try:
-            self.client.trigger(
+            await asyncio.to_thread(
+                self.client.trigger,
                 f'form-{form_id}',  # Channel name
                 'live-update',       # Event name
-                data
+                serialize_payload(data)
             )
             print(f"✅ Broadcasted update to form-{form_id}")
         except Exception as e:
             print(f"❌ Pusher broadcast error: {e}")
     
-    def broadcast_prediction_update(self, form_id: str, game_id: str, prediction: Dict[str, Any]):
+    async def broadcast_prediction_update(self, form_id: str, game_id: str, prediction: Dict[str, Any]):
         """Broadcast updated prediction for a specific game"""
         try:
-            self.client.trigger(
+            await asyncio.to_thread(
+                self.client.trigger,
                 f'form-{form_id}',
                 'prediction-update',
-                {
+                serialize_payload({
                     'game_id': game_id,
                     'prediction': prediction
-                }
+                })
             )
             print(f"✅ Broadcasted prediction update for game {game_id}")
         except Exception as e:
             print(f"❌ Pusher broadcast error: {e}")
     
-    def notify_connection(self, form_id: str, message: str):
+    async def broadcast_batch(self, events: List[Dict[str, Any]]) -> bool:
+        """
+        Broadcast multiple events with as few HTTP requests as possible
+        
+        Args:
+            events: List of events, each with form_id, name and data keys
+        
+        Returns:
+            Whether every event was sent
+        """
+        batch = (
+            {
+                'channel': f"form-{event['form_id']}",
+                'name': event['name'],
+                'data': serialize_payload(event['data'])
+            }
+            for event in events
+        )
+        
+        try:
+            while chunk := list(islice(batch, PUSHER_BATCH_LIMIT)):
+                await asyncio.to_thread(self.client.trigger_batch, chunk)
+            print(f"✅ Broadcasted {len(events)} batched event(s)")
+            return True
+        except Exception as e:
+            print(f"❌ Pusher batch broadcast error: {e}")
+            return False
+    
+    async def notify_connection(self, form_id: str, message: str):
         """Send connection notification"""
         try:
-            self.client.trigger(
+            await asyncio.to_thread(
+                self.client.trigger,
                 f'form-{form_id}',
                 'notification',
-                {'message': message}
+                serialize_payload({'message': message})
             )
         except Exception as e:
             print(f"❌ Pusher notification error: {e}")
@@ -65,10 +108,14 @@ class PusherService:
 pusher_service = PusherService()
 
 # Convenience functions
-def broadcast_update(form_id: str, data: Dict[str, Any]):
+async def broadcast_update(form_id: str, data: Dict[str, Any]):
     """Broadcast live update"""
-    pusher_service.broadcast_live_update(form_id, data)
+    await pusher_service.broadcast_live_update(form_id, data)
 
-def broadcast_prediction(form_id: str, game_id: str, prediction: Dict[str, Any]):
+async def broadcast_prediction(form_id: str, game_id: str, prediction: Dict[str, Any]):
     """Broadcast prediction update"""
-    pusher_service.broadcast_prediction_update(form_id, game_id, prediction)
\ No newline at end of file
+    await pusher_service.broadcast_prediction_update(form_id, game_id, prediction)
+
+async def broadcast_events(events: List[Dict[str, Any]]) -> bool:
+    """Broadcast a batch of events, returning whether all were sent"""
+    return await pusher_service.broadcast_batch(events)
\ No newline at end of file
@@ -0,0 +1,85 @@
+import asyncio
+import functools
+from typing import Any, Callable, Dict, Optional
+
+import orjson
+
+from app.utils.redis_client import RedisClient
+from app.utils.serialization import orjson_default, parse_datetime
+
+def redis_cache(ttl: int, key: Callable[..., str]):
+    """
+    Cache the JSON-serializable result of an async function in Redis
+    
+    Concurrent calls that miss the cache with the same key are coalesced
+    into a single call. Cache hits are returned JSON-decoded, so callers
+    that need richer types (e.g. datetimes) must restore them.
+    
+    Args:
+        ttl: Time to live in seconds
+        key: Builds the cache key from the function's arguments
+    """
+    def decorator(func: Callable):
+        # In-flight calls by cache key, so concurrent misses share one call
+        inflight: Dict[str, asyncio.Task] = {}
+        
+        async def load(cache_key: str, *args, **kwargs):
+            result = await func(*args, **kwargs)
+            
+            # Don't cache misses, the data may become available later
+            if result is None:
+                return None
+            
+            try:
+                payload = orjson.dumps(result, default=orjson_default)
+            except TypeError as e:
+                print(f"❌ Redis cache encode error: {e}")
+                return result
+            
+            client = RedisClient.client
+            if client:
+                try:
+                    await asyncio.to_thread(client.setex, cache_key, ttl, payload)
+                except Exception as e:
+                    print(f"❌ Redis cache write error: {e}")
+            
+            return result
+        
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs)
+            client = RedisClient.client
+            
+            if client:
+                try:
+                    cached = await asyncio.to_thread(client.get, cache_key)
+                    if cached is not None:
+                        return orjson.loads(cached)
+                except Exception as e:
+                    print(f"❌ Redis cache read error: {e}")
+            
+            task = inflight.get(cache_key)
+            if task is None:
+                task = asyncio.ensure_future(load(cache_key, *args, **kwargs))
+                inflight[cache_key] = task
+                task.add_done_callback(lambda _: inflight.pop(cache_key, None))
+            
+            # Shield so one cancelled caller doesn't cancel the shared call
+            return await asyncio.shield(task)
+        
+        return wrapper
+    
+    return decorator
+
+@redis_cache(ttl=3600, key=lambda api_client, home_team, away_team: f"fix:{home_team}:{away_team}")
+async def _find_fixture(api_client, home_team: str, away_team: str) -> Optional[Dict[str, Any]]:
+    return await api_client.find_fixture(home_team, away_team)
+
+async def cached_find_fixture(api_client, home_team: str, away_team: str) -> Optional[Dict[str, Any]]:
+    """Find a fixture, reusing lookups from the last hour"""
+    fixture = await _find_fixture(api_client, home_team, away_team)
+    if not fixture or fixture.get("kickoff") is None:
+        return fixture
+    
+    # Cache hits decode kickoff as a string, store it as a date either way
+    return {**fixture, "kickoff": parse_datetime(fixture["kickoff"]) or fixture["kickoff"]}
@@ -1,4 +1,4 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 from typing import Optional
 import os
 from dotenv import load_dotenv
@@ -7,11 +7,37 @@ load_dotenv()
 
 class Database:
     client: Optional[AsyncIOMotorClient] = None
+    betting_forms: Optional[AsyncIOMotorCollection] = None  # Resolved once on connect
     
     @classmethod
     async def connect_db(cls):
-        cls.client = AsyncIOMotorClient(os.getenv("MONGODB_URL"))
+        cls.client = AsyncIOMotorClient(
+            os.getenv("MONGODB_URL"),
+            maxPoolSize=50,
+            minPoolSize=5,
+            maxIdleTimeMS=30000,  # Recycle idle sockets before they go stale
+            waitQueueTimeoutMS=5000,  # Fail fast instead of queueing forever on pool exhaustion
+            serverSelectionTimeoutMS=3000,
+            compressors="zstd,zlib"  # Wire compression, zstd preferred
+        )
+        cls.betting_forms = cls.get_database()["betting_forms"]
         print("✅ Connected to MongoDB")
+        await cls.create_indexes()
+    
+    @classmethod
+    async def create_indexes(cls):
+        """Create indexes used by the betting form queries"""
+        betting_forms = cls.betting_forms
+        
+        # User form listing sorted by newest first
+        await betting_forms.create_index(
+            [("user_id", 1), ("upload_date", -1)],
+            background=True
+        )
+        
+        # Live updates target individual games within a form
+        await betting_forms.create_index("games.game_id", background=True)
+        print("✅ Ensured MongoDB indexes")
     
     @classmethod
     async def close_db(cls):
@@ -0,0 +1,4 @@
+import asyncio
+
+# Caps concurrent sports API calls across uploads and the live monitor
+sports_api_semaphore = asyncio.Semaphore(10)
\ No newline at end of file
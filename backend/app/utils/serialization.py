@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse as BaseORJSONResponse
+
+def orjson_default(obj: Any) -> Any:
+    """Encode BSON types orjson doesn't handle natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def parse_datetime(value: Any) -> Optional[datetime]:
+    """Parse a datetime or ISO 8601 string into a naive UTC datetime, or None"""
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    return value
+
+class ORJSONResponse(BaseORJSONResponse):
+    """ORJSONResponse that also encodes MongoDB ObjectIds"""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=orjson_default)
@@ -98,6 +98,8 @@ export default function LiveUpdates({ formId }) {
     return 'text-gray-600';
   };
 
+  const formatScore = (score) => `${score.home}-${score.away}`;
+
   const getStatusBadge = (status) => {
     const statusMap = {
       'IN_PLAY': { color: 'bg-red-500', text: 'LIVE' },
@@ -170,7 +172,7 @@ export default function LiveUpdates({ formId }) {
                     <div className="text-center">
                       {getStatusBadge(game.status)}
                       <p className="text-3xl font-bold text-gray-900 mt-2">
-                        {game.current_score}
+                        {formatScore(game.current_score)}
                       </p>
                       {game.minute && (
                         <p className="text-sm text-gray-600 mt-1">{game.minute}'</p>